@@ -0,0 +1,37 @@
+"""
+Phrase Index Backfill
+
+Builds "document_search" phrase entries for documents stored before the
+phrase index existed, or whose entries were never written. Run it once,
+from a single process, after deploying:
+
+    python backfill_search.py
+"""
+
+import asyncio
+
+from database import db
+from search import PHRASE_COLLECTION, build_search_entries
+
+
+async def backfill_phrase_index() -> int:
+    """Build phrase entries for every document not yet flagged phrases_indexed"""
+    count = 0
+    async for doc in db["document"].find(
+        {"phrases_indexed": {"$ne": True}},
+        {"brand": 1, "title": 1, "description": 1, "tags": 1},
+    ):
+        # Drop entries written before brand was recorded on them
+        await db[PHRASE_COLLECTION].delete_many({"record_id": doc["_id"]})
+        entries = build_search_entries(doc["_id"], doc.get("brand"), doc.get("title"), doc.get("description"), doc.get("tags"))
+        if entries:
+            await db[PHRASE_COLLECTION].insert_many(entries)
+        await db["document"].update_one({"_id": doc["_id"]}, {"$set": {"phrases_indexed": True}})
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if db is None:
+        raise SystemExit("DATABASE_URL and DATABASE_NAME must be set")
+    print(f"Indexed {asyncio.run(backfill_phrase_index())} documents")
@@ -1,15 +1,27 @@
+import asyncio
+import calendar
+import gc
 import os
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
+import re
+import aiofiles
+from collections import OrderedDict
+from email.utils import formatdate
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from urllib.parse import quote
 from bson import ObjectId
+from gridfs.errors import NoFile
 
-from database import create_document, get_documents, db
-from schemas import Document
+from database import create_document, get_documents, db, fs_bucket
+from responses import DEFAULT_CACHE_CONTROL, SendfileResponse, content_disposition, etag_matches
+import io_uring_backend
+from search import PHRASE_COLLECTION, build_search_entries, normalize_phrase, parse_tags
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,8 +32,139 @@ app.add_middleware(
 )
 
 STORAGE_DIR = os.getenv("STORAGE_DIR", "storage")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "fs")  # "fs", "io_uring" or "gridfs"
+# When behind nginx, e.g. "/_protected/": hand file transfers to nginx (see nginx.conf.example)
+ACCEL_REDIRECT_PREFIX = os.getenv("ACCEL_REDIRECT_PREFIX")
 os.makedirs(STORAGE_DIR, exist_ok=True)
 
+SENDFILE_CHUNK = 1 << 24  # 16MB per sendfile() call
+UPLOAD_CHUNK = 16 * 1024 * 1024  # 16MB reads in the non-sendfile path
+UPLOAD_SEM = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_UPLOADS", "8")))
+GC_AFTER_UPLOAD_BYTES = 1 << 30  # 1GB
+PREFIX_SEARCH_MAX_LEN = int(os.getenv("PREFIX_SEARCH_MAX_LEN", 32))
+
+RESOLVE_CACHE_SIZE = 4096
+_RESOLVE_CACHE: "OrderedDict[str, dict]" = OrderedDict()
+
+# Fields returned by list_documents; path and description stay in the database
+LIST_PROJECTION = {"title": 1, "brand": 1, "tags": 1, "size": 1, "content_type": 1, "original_name": 1}
+
+
+def _sendfile_upload(src, storage_path: str) -> Optional[Tuple[int, int]]:
+    """Copy a spooled upload into storage_path without a user-space bounce buffer.
+
+    Starlette has already spooled the request body into a SpooledTemporaryFile
+    by the time the endpoint runs. Once it has rolled over to disk the bytes are
+    relocated in-kernel with sendfile(); small in-memory spools are written once.
+    Returns (bytes stored, st_mtime_ns), or None when this platform has no
+    file-to-file sendfile.
+    """
+    out_fd = os.open(storage_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        src.flush()
+        if not getattr(src, "_rolled", True):
+            view = memoryview(src._file.getbuffer())
+            size = len(view)
+            while view:
+                view = view[os.write(out_fd, view):]
+            return size, os.fstat(out_fd).st_mtime_ns
+
+        in_fd = src.fileno()
+        offset = 0
+        try:
+            while True:
+                sent = os.sendfile(out_fd, in_fd, offset, SENDFILE_CHUNK)
+                if not sent:
+                    break
+                offset += sent
+        except (AttributeError, OSError):
+            # e.g. macOS, where sendfile() only targets sockets
+            return None
+
+        if hasattr(os, "posix_fadvise"):
+            # DONTNEED only drops clean pages, so write the upload back first;
+            # then it no longer evicts the hot page cache (and is durable)
+            os.fdatasync(out_fd)
+            os.posix_fadvise(out_fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        return offset, os.fstat(out_fd).st_mtime_ns
+    finally:
+        os.close(out_fd)
+
+async def _iter_upload(file: UploadFile):
+    """Yield an upload's bytes in UPLOAD_CHUNK pieces"""
+    await file.seek(0)
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK)
+        if not chunk:
+            break
+        yield chunk
+
+async def _copy_upload(file: UploadFile, storage_path: str) -> Tuple[int, int]:
+    """Stream an upload to storage_path in large chunks without blocking the event loop
+
+    Returns (bytes stored, st_mtime_ns).
+    """
+    size = 0
+    async with aiofiles.open(storage_path, "wb") as f:
+        async for chunk in _iter_upload(file):
+            await f.write(chunk)
+            size += len(chunk)
+        # Flush first so the mtime we record is the one of the final write
+        await f.flush()
+        stat = await run_in_threadpool(os.fstat, f.fileno())
+    return size, stat.st_mtime_ns
+
+async def _gridfs_upload(file: UploadFile, metadata: dict) -> Tuple[ObjectId, int]:
+    """Stream an upload straight into GridFS; returns (gridfs_id, size)"""
+    grid_in = fs_bucket.open_upload_stream(file.filename, metadata=metadata)
+    size = 0
+    try:
+        async for chunk in _iter_upload(file):
+            await grid_in.write(chunk)
+            size += len(chunk)
+    except BaseException:
+        await grid_in.abort()
+        raise
+    await grid_in.close()
+    return grid_in._id, size
+
+async def _iter_gridfs(grid_out):
+    """Yield a GridFS file one stored chunk at a time"""
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        yield chunk
+
+@app.on_event("startup")
+async def ensure_indexes():
+    """Create the search indexes used by list_documents (idempotent)"""
+    if db is None:
+        return
+    await db["document"].create_index(
+        [("title", "text"), ("description", "text"), ("tags", "text")],
+        weights={"title": 10, "tags": 5, "description": 1},
+        name="doc_text_idx",
+    )
+    await db["document"].create_index([("title_lc", 1)])
+    # brand equality + title prefix, and brand-filtered newest-first listings
+    await db["document"].create_index([("brand", 1), ("title_lc", 1)], name="brand_title_idx")
+    await db["document"].create_index([("brand", 1), ("_id", -1)], name="brand_newest_idx")
+    await db["document"].create_index([("tags_lc", 1)])
+    await db[PHRASE_COLLECTION].create_index([("phraselist", 1), ("brand", 1)])
+    # Documents stored before title_lc/tags_lc existed; a no-op once backfilled
+    await db["document"].update_many(
+        {"title_lc": {"$exists": False}},
+        [{"$set": {
+            "title_lc": {"$toLower": "$title"},
+            "tags_lc": {"$cond": [
+                {"$isArray": "$tags"},
+                {"$map": {"input": "$tags", "in": {"$toLower": "$$this"}}},
+                None,
+            ]},
+        }}],
+    )
+
 @app.get("/")
 def read_root():
     return {"message": "Elevator Docs API running"}
@@ -39,33 +182,56 @@ async def upload_document(
     # Note: large files (e.g., 5GB) require client to support streaming upload
     stored_name = f"{ObjectId()}.{file.filename.split('.')[-1]}" if "." in file.filename else str(ObjectId())
     storage_path = os.path.join(STORAGE_DIR, stored_name)
+    gridfs_id = mtime_ns = None
 
-    # Stream to disk in chunks
+    # Relocate the spooled body to storage off the event loop, with at most
+    # MAX_CONCURRENT_UPLOADS copies holding buffers at once
     try:
-        with open(storage_path, "wb") as f:
-            while True:
-                chunk = await file.read(1024 * 1024)  # 1MB chunks
-                if not chunk:
-                    break
-                f.write(chunk)
+        async with UPLOAD_SEM:
+            if STORAGE_BACKEND == "gridfs":
+                # Straight into MongoDB; nothing is written under STORAGE_DIR
+                gridfs_id, size = await _gridfs_upload(file, {"brand": brand, "content_type": file.content_type})
+                stored_name = storage_path = None
+            elif STORAGE_BACKEND == "io_uring" and io_uring_backend.available:
+                size, mtime_ns = await io_uring_backend.write_stream(storage_path, _iter_upload(file))
+            else:
+                stored = await run_in_threadpool(_sendfile_upload, file.file, storage_path)
+                if stored is None:
+                    stored = await _copy_upload(file, storage_path)
+                size, mtime_ns = stored
     finally:
         await file.close()
+    if size > GC_AFTER_UPLOAD_BYTES:
+        # Break reference cycles left on the UploadFile chain before the next big upload
+        gc.collect()
 
-    size = os.path.getsize(storage_path)
-
-    doc = Document(
-        brand=brand,
-        title=title,
-        description=description,
-        content_type=file.content_type,
-        size=size,
-        filename=stored_name,
-        original_name=file.filename,
-        path=storage_path,
-        tags=[t.strip() for t in tags.split(',')] if tags else None,
-    )
+    tag_list = parse_tags(tags)
+    # Form fields are already validated by FastAPI; build the Document-shaped
+    # dict directly rather than paying for a second pydantic validation pass
+    doc = {
+        "brand": brand,
+        "title": title,
+        "description": description,
+        "content_type": file.content_type,
+        "size": size,
+        "mtime_ns": mtime_ns,
+        "filename": stored_name,
+        "original_name": file.filename,
+        "path": storage_path,
+        "gridfs_id": gridfs_id,
+        "tags": tag_list,
+        "title_lc": title.lower(),
+        "tags_lc": [t.lower() for t in tag_list] if tag_list else None,
+        # Only flagged once its phrase entries exist, so a failed insert below
+        # leaves the document for backfill_search.py to pick up
+        "phrases_indexed": False,
+    }
 
-    inserted_id = create_document("document", doc)
+    inserted_id = await create_document("document", doc)
+    entries = build_search_entries(ObjectId(inserted_id), brand, title, description, tag_list)
+    if entries:
+        await db[PHRASE_COLLECTION].insert_many(entries)
+    await db["document"].update_one({"_id": ObjectId(inserted_id)}, {"$set": {"phrases_indexed": True}})
     return {"id": inserted_id, "message": "Uploaded"}
 
 class DocumentFilter(BaseModel):
@@ -75,67 +241,163 @@ class DocumentFilter(BaseModel):
 # List/search documents
 @app.get("/api/documents")
 async def list_documents(q: Optional[str] = None, brand: Optional[str] = None, limit: int = 100):
+    # A whitespace-only q would become the regex "^" and match everything
+    q = q.strip() if q else None
     filter_query = {}
     if brand:
         filter_query["brand"] = brand
-    # Simple text filter on title/description/tags
-    if q:
-        filter_query["$or"] = [
-            {"title": {"$regex": q, "$options": "i"}},
-            {"description": {"$regex": q, "$options": "i"}},
-            {"tags": {"$elemMatch": {"$regex": q, "$options": "i"}}}
-        ]
-    docs = get_documents("document", filter_query, limit)
-    # Map IDs to strings and remove path for listing
-    for d in docs:
-        d["id"] = str(d.pop("_id"))
-        d.pop("path", None)
-    return {"items": docs}
+    docs = None
+    # Short single-word queries: anchored prefix match on the lowercased btree-indexed
+    # fields (no $options "i", which would defeat the index)
+    if q and len(q) <= PREFIX_SEARCH_MAX_LEN and not any(c.isspace() for c in q):
+        prefix = {"$regex": "^" + re.escape(q.lower())}
+        docs = await get_documents(
+            "document", {**filter_query, "$or": [{"title_lc": prefix}, {"tags_lc": prefix}]}, limit,
+            projection=LIST_PROJECTION,
+        )
+    elif q:
+        # Multi-word queries: exact phrase lookup in the phrase index first
+        phrase_query = {"phraselist": normalize_phrase(q)}
+        if brand:
+            phrase_query["brand"] = brand
+        # Group and cap on the server: distinct() returns every match in one
+        # 16MB document and fails on common phrases
+        groups = await db[PHRASE_COLLECTION].aggregate([
+            {"$match": phrase_query},
+            {"$group": {"_id": "$record_id"}},
+            {"$limit": limit},
+        ]).to_list(None)
+        record_ids = [g["_id"] for g in groups]
+        if record_ids:
+            docs = await get_documents(
+                "document", {**filter_query, "_id": {"$in": record_ids}}, limit, projection=LIST_PROJECTION,
+            )
+    if q and not docs:
+        # Nothing from the indexed fast paths (mid-word matches, descriptions):
+        # full-text search via doc_text_idx, best matches first
+        docs = await get_documents(
+            "document", {**filter_query, "$text": {"$search": q}}, limit,
+            projection={**LIST_PROJECTION, "score": {"$meta": "textScore"}},
+            sort=[("score", {"$meta": "textScore"})],
+        )
+    elif not q:
+        # Plain listings: newest first
+        docs = await get_documents("document", filter_query, limit, projection=LIST_PROJECTION, sort=[("_id", -1)])
+    # Build the JSON-ready rows in a single pass instead of mutating each document
+    items = [
+        {
+            "id": str(d["_id"]),
+            "brand": d.get("brand"),
+            "title": d.get("title"),
+            "size": d.get("size"),
+            "tags": d.get("tags"),
+            "original_name": d.get("original_name"),
+            "content_type": d.get("content_type"),
+        }
+        for d in docs
+    ]
+    return {"items": items}
 
-# Download a file
-@app.get("/api/documents/{doc_id}/download")
-async def download_document(doc_id: str):
-    from bson import ObjectId
-    try:
-        _id = ObjectId(doc_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid document id")
+async def _resolve(doc_id: str) -> Optional[dict]:
+    """Look up how to serve a document; None if it doesn't exist
 
-    doc = db["document"].find_one({"_id": _id})
-    if not doc:
-        raise HTTPException(status_code=404, detail="Document not found")
+    Returns path or gridfs_id (whichever storage holds the file), filename,
+    media_type and size.
 
-    file_path = doc.get("path")
-    if not file_path or not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="File not found on server")
+    Hits are kept in a small LRU; stored documents never change, and misses are
+    not cached, so no invalidation is needed.
+    """
+    cached = _RESOLVE_CACHE.get(doc_id)
+    if cached is not None:
+        _RESOLVE_CACHE.move_to_end(doc_id)
+        return cached
 
-    filename = doc.get("original_name") or doc.get("filename")
-    media_type = doc.get("content_type") or "application/octet-stream"
-    return FileResponse(path=file_path, filename=filename, media_type=media_type)
+    doc = await db["document"].find_one(
+        {"_id": ObjectId(doc_id)},
+        {"path": 1, "gridfs_id": 1, "original_name": 1, "content_type": 1, "filename": 1, "size": 1, "mtime_ns": 1},
+    )
+    if not doc:
+        return None
+    resolved = {
+        "path": doc.get("path"),
+        "gridfs_id": doc.get("gridfs_id"),
+        "filename": doc.get("original_name") or doc.get("filename"),
+        "media_type": doc.get("content_type") or "application/octet-stream",
+        "size": doc.get("size"),
+        "mtime_ns": doc.get("mtime_ns"),
+    }
+    _RESOLVE_CACHE[doc_id] = resolved
+    if len(_RESOLVE_CACHE) > RESOLVE_CACHE_SIZE:
+        _RESOLVE_CACHE.popitem(last=False)
+    return resolved
 
-# Stream inline viewing (e.g., PDFs)
-@app.get("/api/documents/{doc_id}/view")
-async def view_document(doc_id: str):
-    from bson import ObjectId
-    try:
-        _id = ObjectId(doc_id)
-    except Exception:
+async def _serve(request: Request, doc_id: str, inline: bool):
+    """Shared body of the download and view endpoints"""
+    if not ObjectId.is_valid(doc_id):
         raise HTTPException(status_code=400, detail="Invalid document id")
 
-    doc = db["document"].find_one({"_id": _id})
-    if not doc:
+    resolved = await _resolve(doc_id)
+    if not resolved:
         raise HTTPException(status_code=404, detail="Document not found")
 
-    file_path = doc.get("path")
-    if not file_path or not os.path.exists(file_path):
+    disposition_type = "inline" if inline else "attachment"
+    if resolved["gridfs_id"] is not None:
+        try:
+            grid_out = await fs_bucket.open_download_stream(resolved["gridfs_id"])
+        except NoFile:
+            raise HTTPException(status_code=404, detail="File not found on server")
+        # GridFS files are immutable, so their id identifies the content
+        etag = f'"{grid_out.length:x}-{resolved["gridfs_id"]}"'
+        headers = {
+            "etag": etag,
+            "last-modified": formatdate(calendar.timegm(grid_out.upload_date.utctimetuple()), usegmt=True),
+            "cache-control": DEFAULT_CACHE_CONTROL,
+        }
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        headers["content-length"] = str(grid_out.length)
+        headers["content-disposition"] = content_disposition(resolved["filename"], disposition_type)
+        if request.method == "HEAD":
+            # Headers only; don't pull every chunk out of GridFS just to drop it
+            return Response(media_type=resolved["media_type"], headers=headers)
+        return StreamingResponse(_iter_gridfs(grid_out), media_type=resolved["media_type"], headers=headers)
+
+    # No exists() pre-check: SendfileResponse (or nginx) answers 404 if the file is gone
+    file_path = resolved["path"]
+    if not file_path:
         raise HTTPException(status_code=404, detail="File not found on server")
 
-    filename = doc.get("original_name") or doc.get("filename")
-    media_type = doc.get("content_type") or "application/octet-stream"
-    return FileResponse(path=file_path, filename=filename, media_type=media_type)
+    if ACCEL_REDIRECT_PREFIX:
+        # nginx serves the body (sendfile, ranges, validators); we only send headers
+        headers = {
+            "X-Accel-Redirect": ACCEL_REDIRECT_PREFIX + quote(os.path.basename(file_path)),
+            "Content-Disposition": content_disposition(resolved["filename"], disposition_type),
+        }
+        if inline:
+            headers["X-Accel-Buffering"] = "no"
+        return Response(media_type=resolved["media_type"], headers=headers)
+
+    return SendfileResponse(
+        path=file_path,
+        filename=resolved["filename"],
+        media_type=resolved["media_type"],
+        size=resolved["size"],
+        mtime_ns=resolved["mtime_ns"],
+        content_disposition_type=disposition_type,
+    )
+
+# Download a file
+@app.api_route("/api/documents/{doc_id}/download", methods=["GET", "HEAD"])
+async def download_document(request: Request, doc_id: str):
+    return await _serve(request, doc_id, inline=False)
+
+# Stream inline viewing (e.g., PDFs)
+@app.api_route("/api/documents/{doc_id}/view", methods=["GET", "HEAD"])
+async def view_document(request: Request, doc_id: str):
+    return await _serve(request, doc_id, inline=True)
 
 @app.get("/test")
-def test_database():
+async def test_database():
     """Test endpoint to check if database is available and accessible"""
     response = {
         "backend": "✅ Running",
@@ -158,7 +420,7 @@ def test_database():
 
             # Try to list collections to verify connectivity
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]  # Show first 10 collections
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -182,4 +444,12 @@ def test_database():
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # Multiple workers need the app as an import string
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)),
+    )
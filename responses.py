@@ -0,0 +1,202 @@
+"""
+Response Helpers
+
+File responses for the document download/view endpoints, with byte ranges
+and conditional requests. The body is read in large chunks on a worker
+thread; no server in requirements.txt (uvicorn) implements the ASGI
+zerocopysend extension, so the kernel fast path for downloads is nginx via
+X-Accel-Redirect (ACCEL_REDIRECT_PREFIX), not this module.
+"""
+
+import os
+import re
+from email.utils import formatdate
+from typing import Mapping, Optional
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+CHUNK_SIZE = 1024 * 1024  # read size when the server has no zerocopysend (uvicorn)
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"  # stored files never change
+
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+def content_disposition(filename: str, disposition_type: str = "attachment") -> str:
+    """Build a Content-Disposition value, RFC 5987-encoding non-ASCII names"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition_type}; filename*=utf-8''{quoted}"
+    return f'{disposition_type}; filename="{filename}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+class SendfileResponse(Response):
+    """Serve a file from disk in large chunks read on a worker thread.
+
+    The file is only handed to the server for sendfile() if it advertises the
+    ASGI ``http.response.zerocopysend`` extension, which uvicorn does not; for
+    a kernel-side transfer put nginx in front (see ACCEL_REDIRECT_PREFIX).
+
+    ``size``/``mtime_ns`` recorded at upload time skip the fstat() when both
+    are known, and a matching If-None-Match then gets a 304 without the file
+    being opened at all. Single ``Range: bytes=`` requests are answered with
+    206 Partial Content, and HEAD requests get the same headers with an empty
+    body.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        filename: Optional[str] = None,
+        media_type: Optional[str] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        content_disposition_type: str = "attachment",
+        cache_control: str = DEFAULT_CACHE_CONTROL,
+        size: Optional[int] = None,
+        mtime_ns: Optional[int] = None,
+    ):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.cache_control = cache_control
+        self.status_code = 200
+        self.media_type = media_type or "application/octet-stream"
+        self.background = None
+        self.init_headers(headers)
+        if filename is not None:
+            self.headers.setdefault("content-disposition", content_disposition(filename, content_disposition_type))
+
+    def _parse_range(self, scope: Scope, size: int):
+        """Return (start, end) for a single satisfiable byte range, None for the whole file.
+
+        Raises ValueError when the range cannot be satisfied.
+        """
+        header = Headers(scope=scope).get("range")
+        if not header:
+            return None
+        match = _RANGE_RE.fullmatch(header.strip())
+        if not match:
+            # Multiple or malformed ranges: serve the full representation
+            return None
+        first, last = match.groups()
+        if size == 0:
+            # An empty representation has no satisfiable byte ranges (RFC 7233 4.4)
+            raise ValueError("empty file")
+        if not first:
+            if not last:
+                return None
+            length = int(last)
+            if length == 0:
+                raise ValueError("empty suffix range")
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            raise ValueError("range not satisfiable")
+        return start, end
+
+    async def _open(self):
+        try:
+            return await anyio.to_thread.run_sync(open, self.path, "rb")
+        except FileNotFoundError:
+            # Nothing has been sent yet, so the exception middleware can still answer
+            raise HTTPException(status_code=404, detail="File not found on server")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        fh = None
+        try:
+            size, mtime_ns = self.size, self.mtime_ns
+            if size is None or mtime_ns is None:
+                fh = await self._open()
+                stat = os.fstat(fh.fileno())
+                size, mtime_ns = stat.st_size, stat.st_mtime_ns
+            # Strong validator: byte ranges may only be combined under a strong ETag
+            etag = f'"{size:x}-{mtime_ns:x}"'
+            self.headers["accept-ranges"] = "bytes"
+            self.headers["etag"] = etag
+            self.headers["last-modified"] = formatdate(mtime_ns / 1e9, usegmt=True)
+            self.headers.setdefault("cache-control", self.cache_control)
+
+            if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+                # With upload-time size/mtime this answers without touching the file
+                self.status_code = 304
+                for name in ("content-type", "content-disposition"):
+                    if name in self.headers:
+                        del self.headers[name]
+                await send({
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                })
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+            if fh is None:
+                fh = await self._open()
+
+            start, end = 0, size - 1
+            try:
+                byte_range = self._parse_range(scope, size)
+            except ValueError:
+                self.status_code = 416
+                self.headers["content-range"] = f"bytes */{size}"
+                byte_range = None
+                end = -1  # empty body
+            if byte_range is not None:
+                start, end = byte_range
+                self.status_code = 206
+                self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            count = end - start + 1
+            self.headers["content-length"] = str(count)
+
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            })
+
+            if scope["method"] == "HEAD" or count <= 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+
+            # Only servers implementing zerocopysend take this branch; uvicorn never
+            # does, so under it every download is copied through the loop below.
+            # MSG_ZEROCOPY is not an option either: the socket belongs to the
+            # server's transport. Use nginx X-Accel-Redirect to avoid the copy.
+            if ZEROCOPY_EXTENSION in scope.get("extensions", {}):
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": fh,
+                    "offset": start,
+                    "count": count,
+                    "more_body": False,
+                })
+                return
+
+            if start:
+                fh.seek(start)
+            remaining = count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(fh.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if fh is not None:
+                await anyio.to_thread.run_sync(fh.close)
@@ -12,7 +12,7 @@ Model name is converted to lowercase for the collection name:
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Any, Optional, List
 
 # Example schemas (you can keep or remove if not needed):
 
@@ -45,7 +45,12 @@ class Document(BaseModel):
     description: Optional[str] = Field(None, description="Optional description/notes")
     content_type: Optional[str] = Field(None, description="MIME type of the file, e.g., application/pdf")
     size: Optional[int] = Field(None, ge=0, description="File size in bytes")
+    mtime_ns: Optional[int] = Field(None, description="Stored file mtime (ns), used for ETag/Last-Modified")
     filename: Optional[str] = Field(None, description="Stored filename on server")
     original_name: Optional[str] = Field(None, description="Original uploaded filename")
     path: Optional[str] = Field(None, description="Filesystem path where file is stored")
+    gridfs_id: Optional[Any] = Field(None, description="GridFS file id when stored in MongoDB instead of on disk")
     tags: Optional[List[str]] = Field(default=None, description="Search tags")
+    title_lc: Optional[str] = Field(None, description="Lowercased title for indexed prefix search")
+    tags_lc: Optional[List[str]] = Field(default=None, description="Lowercased tags for indexed prefix search")
+    phrases_indexed: Optional[bool] = Field(None, description="Whether document_search phrase entries exist")
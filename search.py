@@ -0,0 +1,60 @@
+"""
+Search Helpers
+
+Phrase index for exact-match document search. Each uploaded document is
+exploded into short lowercased word windows stored in the "document_search"
+collection, so a multi-word query becomes an indexed equality lookup on
+`phraselist` instead of a regex scan.
+"""
+
+import re
+from typing import Iterable, List, Optional
+
+PHRASE_COLLECTION = "document_search"
+MIN_PHRASE_WORDS = 2
+MAX_PHRASE_WORDS = 6
+
+_TAG_RE = re.compile(r"\s*,\s*")
+
+
+def parse_tags(tags: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated tags field; None when it holds no tags"""
+    if not tags:
+        return None
+    # Split and strip in one C-level pass; dict.fromkeys drops repeats but keeps order
+    return list(dict.fromkeys(t for t in _TAG_RE.split(tags.strip()) if t)) or None
+
+
+def normalize_phrase(text: str) -> str:
+    """Lowercase and collapse whitespace so queries match stored phrases"""
+    return " ".join(text.lower().split())
+
+
+def build_phraselist(text: Optional[str], min: int = MIN_PHRASE_WORDS, max: int = MAX_PHRASE_WORDS) -> List[str]:
+    """Return every lowercased min..max word sliding window of text"""
+    words = normalize_phrase(text or "").split()
+    phrases = []
+    for n in range(min, max + 1):
+        for i in range(len(words) - n + 1):
+            phrases.append(" ".join(words[i:i + n]))
+    return phrases
+
+
+def build_search_entries(record_id, brand: str, title: str, description: Optional[str],
+                         tags: Optional[Iterable[str]]) -> List[dict]:
+    """Build the per-section phrase documents for one uploaded document
+
+    brand is copied onto each entry so brand-filtered lookups only return
+    record_ids the brand filter will keep.
+    """
+    sections = {
+        "title": build_phraselist(title),
+        "description": build_phraselist(description),
+        # Windows never span two tags
+        "tags": [p for tag in tags or () for p in build_phraselist(tag)],
+    }
+    return [
+        {"record_id": record_id, "brand": brand, "section": section, "phraselist": sorted(set(phrases))}
+        for section, phrases in sections.items()
+        if phrases
+    ]
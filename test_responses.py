@@ -0,0 +1,134 @@
+"""
+SendfileResponse Tests
+
+Range, conditional and HEAD handling of the download/view response.
+"""
+
+import os
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from responses import SendfileResponse
+
+CONTENT = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def files(tmp_path):
+    full = tmp_path / "doc.pdf"
+    full.write_bytes(CONTENT)
+    empty = tmp_path / "empty.pdf"
+    empty.write_bytes(b"")
+    return {"doc": str(full), "empty": str(empty), "missing": str(tmp_path / "missing.pdf")}
+
+
+@pytest.fixture
+def client(files):
+    async def serve(request):
+        return SendfileResponse(files[request.path_params["name"]], filename="doc.pdf", media_type="application/pdf")
+
+    app = Starlette(routes=[Route("/{name}", serve, methods=["GET", "HEAD"])])
+    return TestClient(app)
+
+
+def test_full_download(client):
+    r = client.get("/doc")
+    assert r.status_code == 200
+    assert r.content == CONTENT
+    assert r.headers["content-length"] == str(len(CONTENT))
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["content-disposition"] == 'attachment; filename="doc.pdf"'
+    assert r.headers["etag"]
+    assert r.headers["last-modified"]
+
+
+def test_explicit_range(client):
+    r = client.get("/doc", headers={"Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.content == CONTENT[10:20]
+    assert r.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+
+def test_open_ended_range(client):
+    r = client.get("/doc", headers={"Range": "bytes=10000-"})
+    assert r.status_code == 206
+    assert r.content == CONTENT[10000:]
+
+
+def test_suffix_range(client):
+    r = client.get("/doc", headers={"Range": "bytes=-5"})
+    assert r.status_code == 206
+    assert r.content == CONTENT[-5:]
+    assert r.headers["content-range"] == f"bytes {len(CONTENT) - 5}-{len(CONTENT) - 1}/{len(CONTENT)}"
+
+
+def test_out_of_range(client):
+    r = client.get("/doc", headers={"Range": f"bytes={len(CONTENT)}-"})
+    assert r.status_code == 416
+    assert r.content == b""
+    assert r.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+
+def test_multiple_ranges_serve_full_file(client):
+    r = client.get("/doc", headers={"Range": "bytes=0-1,5-6"})
+    assert r.status_code == 200
+    assert r.content == CONTENT
+
+
+def test_empty_file(client):
+    r = client.get("/empty")
+    assert r.status_code == 200
+    assert r.content == b""
+    assert r.headers["content-length"] == "0"
+
+
+@pytest.mark.parametrize("byte_range", ["bytes=-5", "bytes=0-"])
+def test_empty_file_range_not_satisfiable(client, byte_range):
+    r = client.get("/empty", headers={"Range": byte_range})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == "bytes */0"
+
+
+def test_head(client):
+    r = client.head("/doc")
+    assert r.status_code == 200
+    assert r.content == b""
+    assert r.headers["content-length"] == str(len(CONTENT))
+    assert r.headers["accept-ranges"] == "bytes"
+
+
+def test_head_range(client):
+    r = client.head("/doc", headers={"Range": "bytes=0-9"})
+    assert r.status_code == 206
+    assert r.content == b""
+    assert r.headers["content-length"] == "10"
+
+
+def test_if_none_match(client):
+    etag = client.get("/doc").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        r = client.get("/doc", headers={"If-None-Match": header})
+        assert r.status_code == 304
+        assert r.content == b""
+        assert r.headers["etag"] == etag
+    assert client.get("/doc", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_stored_size_and_mtime_skip_stat(files):
+    stat = os.stat(files["doc"])
+
+    async def serve(request):
+        return SendfileResponse(files["doc"], size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    client = TestClient(Starlette(routes=[Route("/", serve)]))
+    etag = client.get("/").headers["etag"]
+    assert etag == f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_missing_file(client):
+    r = client.get("/missing")
+    assert r.status_code == 404
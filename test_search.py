@@ -0,0 +1,64 @@
+"""
+Search Helper Tests
+
+Phrase windows, per-section search entries and tag parsing for uploads.
+"""
+
+import pytest
+
+from search import build_phraselist, build_search_entries, parse_tags
+
+
+@pytest.mark.parametrize("words, expected", [
+    # n words give n-k+1 windows of each length k in 2..6
+    (2, 1),
+    (3, 3),
+    (4, 6),
+    (5, 10),
+    (6, 15),
+    (7, 20),
+])
+def test_phraselist_window_counts(words, expected):
+    text = " ".join(f"w{i}" for i in range(words))
+    assert len(build_phraselist(text)) == expected
+
+
+def test_phraselist_windows():
+    assert build_phraselist("Door  Operator Manual") == [
+        "door operator",
+        "operator manual",
+        "door operator manual",
+    ]
+
+
+@pytest.mark.parametrize("text", [None, "", "   ", "Manual"])
+def test_phraselist_too_short(text):
+    assert build_phraselist(text) == []
+
+
+def test_tag_windows_never_span_tags():
+    (entry,) = build_search_entries(1, "Otis", "Manual", None, ["door operator", "cab"])
+    assert entry["section"] == "tags"
+    assert entry["phraselist"] == ["door operator"]
+
+
+def test_search_entries_drop_empty_sections():
+    entries = build_search_entries(1, "Otis", "Install Guide", "Single", None)
+    assert entries == [
+        {"record_id": 1, "brand": "Otis", "section": "title", "phraselist": ["install guide"]},
+    ]
+
+
+def test_search_entries_dedupe_and_sort_phrases():
+    (entry,) = build_search_entries(1, "Otis", None, "cab door cab door", None)
+    assert entry["phraselist"] == sorted(set(entry["phraselist"]))
+    assert entry["phraselist"].count("cab door") == 1
+
+
+def test_parse_tags_splits_strips_and_dedupes_in_order():
+    assert parse_tags(" a , b,a,, ") == ["a", "b"]
+
+
+@pytest.mark.parametrize("tags", [None, "", "   ", ",", " , ,, "])
+def test_parse_tags_without_tags(tags):
+    assert parse_tags(tags) is None